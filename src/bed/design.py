@@ -1,12 +1,36 @@
+import collections
+import copy
+import itertools
+import numbers
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
 from bed.grid import Grid, GridStack
 
+# Number of elements in each cache-sized block of the EIG working buffer.
+BLOCK_SIZE = 1 << 16
+
+
+def xlog2x(x):
+    """Return x * log2(x) for an array of probabilities, using 0 log 0 = 0.
+    The result is calculated in a single new array without any other temporaries.
+    """
+    x = np.asarray(x)
+    # Clamping to the smallest positive float gives 0 log 0 = 0 without a masked log2 and
+    # its boolean mask temporary, since the clamped values are multiplied by x = 0.
+    result = np.maximum(x, np.finfo(x.dtype).tiny)
+    np.log2(result, out=result)
+    result *= x
+    return result
+
 
 class ExperimentDesigner:
     """Brute force calculation of expected information gain using Grids to define the parameters, features, and designs."""
 
-    def __init__(self, parameters, features, designs, unnorm_lfunc, lfunc_args={}, mem=None):
+    def __init__(self, parameters, features, designs, unnorm_lfunc, lfunc_args={}, mem=None,
+                 dtype=np.float64, n_jobs=1):
         """Initialize an experiment designer.
 
         Parameters
@@ -23,28 +47,60 @@ class ExperimentDesigner:
         lfunc_args : dict
             additional parameters that are required to evaluate the likelihood function
         mem : float
-            memory limit in MB
+            memory limit in MB. When set, the designs are processed in subgrids
+            sized so that the subgrid likelihoods held at once fit within this limit.
+            The other working buffers are cache-sized blocks or much smaller arrays.
+            Setting it close to the cache size keeps each subgrid cache resident
+            through the EIG pipeline, at the cost of more subgrid iterations.
+        dtype : numpy dtype
+            floating point type used for the likelihood and working buffer,
+            either np.float64 or np.float32.
+            Use np.float32 to halve the memory usage and bandwidth of the EIG
+            calculation, at the cost of reduced precision.
+        n_jobs : int
+            number of threads used to process design subgrids in parallel, or -1
+            to use all available cores. The memory limit is shared between threads.
+            The likelihood function must be safe to call from multiple threads.
+            With a single job and several subgrids, the likelihood of the next subgrid
+            is evaluated in a background thread while the current one is processed.
         """
         self.parameters = parameters
         self.features = features
         self.designs = designs
         self.unnorm_lfunc = unnorm_lfunc
         self.lfunc_args = lfunc_args
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.float64):
+            raise ValueError("dtype must be np.float32 or np.float64")
+        # Tolerance used for normalization checks, loosened for reduced precision.
+        self._rtol = max(1e-5, 1000 * np.finfo(self.dtype).eps)
+        # Accept any integer type, e.g. np.int64, but not a bool.
+        if isinstance(n_jobs, bool) or not isinstance(n_jobs, numbers.Integral):
+            raise ValueError("n_jobs must be a positive integer or -1")
+        n_jobs = int(n_jobs)
+        if n_jobs == -1:
+            n_jobs = os.cpu_count() or 1
+        if n_jobs <= 0:
+            raise ValueError("n_jobs must be a positive integer or -1")
+        self.n_jobs = n_jobs
         if mem is None:
-            self.design_subgrid = int(np.prod(self.designs.shape))
-            self.num_subgrids = 1
+            # Use one subgrid per thread.
+            self.design_subgrid = int(np.ceil(np.prod(self.designs.shape) / self.n_jobs))
+            self.num_subgrids = self.designs.n_subgrids(self.design_subgrid)
         else:
             if mem <= 0:
                 raise ValueError("Memory limit must be positive")
             # Calculate the fractional decrease required to meet the memory limit
-            # accounting for the fact that the buffer doubles the memory usage.
-            frac = mem / (2 * (np.prod(self.features.shape) * 
+            # accounting for the number of subgrid likelihoods held at once: one per thread,
+            # or two with a single job, which holds the next likelihood while it is prefetched.
+            nlikelihoods = 2 if self.n_jobs == 1 else self.n_jobs
+            frac = mem / (nlikelihoods * (np.prod(self.features.shape) * 
                 np.prod(self.designs.shape) * 
-                np.prod(self.parameters.shape) * 8)/(1 << 20))
+                np.prod(self.parameters.shape) * self.dtype.itemsize)/(1 << 20))
             self.design_subgrid = int(frac * np.prod(self.designs.shape))
-            self.num_subgrids = np.ceil(np.prod(self.designs.shape) / self.design_subgrid)
             if self.design_subgrid == 0:
                 raise ValueError("Memory limit too low,", f"invalid subgrid size: {frac * np.prod(self.designs.shape)} < 1")
+            self.num_subgrids = self.designs.n_subgrids(self.design_subgrid)
         self._initialized = False
         self.EIG = np.full(self.designs.shape, np.nan)
 
@@ -73,105 +129,273 @@ class ExperimentDesigner:
         dict of design variable names and corresponding values where the calculated
         EIG is maximized.
         """
+        prior = np.asarray(prior, dtype=self.dtype)
         self.prior = prior
-        if not np.allclose(self.parameters.sum(self.prior), 1):
+        if not np.allclose(self.parameters.sum(self.prior), 1, rtol=self._rtol):
             raise ValueError("Prior probabilities must sum to 1")
         # Calculate prior entropy in bits (careful with x log x = 0 for x=0).
-        log2prior = np.log2(prior, out=np.zeros_like(prior), where=prior > 0)
-        self.H0 = -self.parameters.sum(prior * log2prior)
-        for i, (s, mask) in enumerate(self.designs.subgrid(self.design_subgrid)):
+        self.H0 = -self.parameters.sum(xlog2x(prior.astype(np.float64)))
+        # The parameters are the trailing axes of the stack below, so sums of x * prior over
+        # parameters are contractions with the (constraint weighted) prior that BLAS can perform
+        # without materializing the product.
+        weighted_prior = self.prior
+        if self.parameters.constraint is not None:
+            # Keep our dtype so the contractions do not upcast the likelihood.
+            weighted_prior = (self.prior * self.parameters.constraint_weights).astype(self.dtype)
+        # Subgrids are streamed from a generator, so only those being processed are held in
+        # memory. Only the marginal and IG of the first subgrid are kept (for the describe
+        # function), so they are not tabulated for the others.
+        subgrids = (s for (s, mask) in self.designs.subgrid(self.design_subgrid))
+        first = next(subgrids)
+        self.subgrid_shape = first.shape
+        results = self._map_subgrids(
+            lambda s, features, parameters, likelihood: self._subgrid_EIG(
+                s, features, parameters, weighted_prior, debug, likelihood, tabulate=s is first
+            ),
+            itertools.chain([first], subgrids),
+        )
+        # Subgrids cover consecutive ranges of the flattened designs, so write each result
+        # into a contiguous slice instead of scanning the full subgrid mask.
+        EIG_flat = self.EIG.reshape(-1)
+        offset = 0
+        for i, (marginal, IG, EIG) in enumerate(results):
             if i == 0:
-                # Store first subgrid likelihood for describe function
-                self.subgrid_shape = s.shape
-            with GridStack(self.features, s, self.parameters):
-                sub_likelihood = self.likelihood_func(s) # use of memory
-                assert np.allclose(self.features.sum(sub_likelihood), 1)
-                # Tabulate the marginal probability P(y|xi) by integrating P(y|theta,xi) P(theta) over theta.
-                # No explicit normalization is required since P(y|theta,xi) and P(theta) are already normalized.
-                # Check that the likelihood is normalized over features
-                self._buffer = np.array(sub_likelihood)
-                self._buffer *= self.prior
-                if i == 0:
-                    # Store first subgrid likelihood for describe function
-                    self.marginal = self.parameters.sum(self._buffer)
-                marginal = self.parameters.sum(self._buffer)
-                if debug:
-                    assert np.allclose(self.parameters.sum(self.likelihood_func(s) * self.prior), 
-                                    marginal), "marginal check failed"
-                # Tabulate the posterior P(theta|y,xi) by normalizing P(y|theta,xi) P(theta) over parameters.
-                # Use the prior for any (design, feature) points where the likelihood x prior is zero
-                # so the corresponding information gain is zero.
-                post_norm = self.parameters.sum(self._buffer, keepdims=True)
-                self._buffer = np.divide(
-                    self._buffer, post_norm, out=self._buffer, where=post_norm > 0
-                )
-                if debug:
-                    # This will fail if the likelihood*prior is zero for any (design, feature) point.
-                    posterior = self.parameters.normalize(self.likelihood_func(s) * self.prior)
-                    assert np.allclose(posterior, self._buffer), "posterior check failed"
-                # Tabulate the information gain in bits IG = post * log2(post) + H0.
-                # Do the calculations in stages to avoid allocating any large temporary arrays.
-                np.log2(self._buffer, out=self._buffer, where=self._buffer > 0)
-                self._buffer *= self.likelihood_func(s)
-                self._buffer *= self.prior
-                self._buffer = np.divide(
-                    self._buffer, post_norm, out=self._buffer, where=post_norm > 0
-                )
-                if i == 0:
-                    self.IG = self.H0 + self.parameters.sum(self._buffer)
-                IG = self.H0 + self.parameters.sum(self._buffer)
-                IG[post_norm.reshape(IG.shape) == 0] = 0
-                if debug:
-                    log2posterior = np.log2(
-                        posterior, out=np.zeros_like(posterior), where=posterior > 0
-                    )
-                    assert np.allclose(self.H0 + self.parameters.sum(posterior * log2posterior), 
-                                    IG), "IG check failed"
-
-                self.EIG[mask] = self.features.sum(marginal * IG).flatten()
+                # Store first subgrid results for describe function
+                self.marginal = marginal
+                self.IG = IG
+            EIG_flat[offset : offset + EIG.size] = EIG
+            offset += EIG.size
         self._initialized = True
-        del self._buffer
         return self.designs.getmax(self.EIG)
 
-    def likelihood_func(self, s):
-        likelihood = self.unnorm_lfunc(self.parameters, self.features, s, **self.lfunc_args)
-        self.features.normalize(likelihood)
+    def _map_subgrids(self, func, subgrids):
+        """Apply func(s, features, parameters, likelihood) to each design subgrid s from an
+        iterable and yield the results in order. Subgrids are processed in parallel threads when
+        n_jobs > 1, and each call evaluates its own likelihood (passed as None). Otherwise, the
+        likelihood of each subgrid is prefetched while the previous subgrid is processed.
+        Subgrids are only taken from the iterable as they are needed, so at most n_jobs
+        subgrids (or two with prefetching) are in flight at once.
+        """
+        if self.n_jobs == 1:
+            if self.num_subgrids == 1:
+                for s in subgrids:
+                    yield func(s, self.features, self.parameters, None)
+                return
+            for s, likelihood in self._prefetch_likelihoods(subgrids):
+                yield func(s, self.features, self.parameters, likelihood)
+            return
+
+        def task(s):
+            # GridStack modifies the grids it stacks, so each task uses its own shallow copies.
+            return func(s, copy.copy(self.features), copy.copy(self.parameters), None)
+
+        with ThreadPoolExecutor(max_workers=self.n_jobs) as pool:
+            pending = collections.deque()
+            for s in subgrids:
+                if len(pending) == self.n_jobs:
+                    yield pending.popleft().result()
+                pending.append(pool.submit(task, s))
+            while pending:
+                yield pending.popleft().result()
+
+    def _prefetch_likelihoods(self, subgrids):
+        """Yield each design subgrid from an iterable with its likelihood, evaluating the
+        likelihood of the next subgrid in a background thread while the caller processes
+        the current one.
+        """
+        # The background thread uses its own copies of our grids since the caller is stacking
+        # them at the same time. These must be copied here, before the caller stacks them.
+        features, parameters = copy.copy(self.features), copy.copy(self.parameters)
+
+        def evaluate(s):
+            with GridStack(features, s, parameters):
+                return self.likelihood_func(s, features, parameters)
+
+        subgrids = iter(subgrids)
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            s = next(subgrids)
+            future = pool.submit(evaluate, s)
+            for next_s in subgrids:
+                likelihood = future.result()
+                future = pool.submit(evaluate, next_s)
+                yield s, likelihood
+                s = next_s
+            yield s, future.result()
+
+    def _subgrid_EIG(self, s, features, parameters, weighted_prior, debug, sub_likelihood=None,
+                     tabulate=True):
+        """Calculate the marginal, IG and EIG for a single subgrid s of the designs,
+        using its likelihood when this has already been evaluated. The marginal and IG
+        are only returned (otherwise None) when tabulate is True, and the IG is only
+        calculated when tabulate or debug is True.
+        """
+        nparams = len(parameters.shape)
+        with GridStack(features, s, parameters):
+            if sub_likelihood is None:
+                # Evaluate the likelihood once per subgrid and reuse it below.
+                sub_likelihood = self.likelihood_func(s, features, parameters) # use of memory
+            if debug:
+                # likelihood_func normalizes over features, so only check this when debugging.
+                assert np.allclose(features.sum(sub_likelihood), 1, rtol=self._rtol), "likelihood check failed"
+            # Tabulate the marginal probability P(y|xi) by integrating P(y|theta,xi) P(theta) over theta.
+            # No explicit normalization is required since P(y|theta,xi) and P(theta) are already normalized.
+            marginal = np.tensordot(sub_likelihood, weighted_prior, axes=nparams)
+            if debug:
+                # The debug checks compare with simpler expressions evaluated in float64, using
+                # tolerances for the precision of our dtype.
+                likelihood64 = sub_likelihood.astype(np.float64)
+                assert np.allclose(parameters.sum(likelihood64 * self.prior),
+                                marginal, rtol=self._rtol), "marginal check failed"
+            # Since the EIG is the mutual information between parameters and features, it
+            # separates as EIG = H[marginal] - sum(prior * H[likelihood]) where the entropies are
+            # over features. The sum over parameters of prior * likelihood * log2(likelihood),
+            # cond below, is the only pass over the full likelihood that this requires.
+            # The elementwise calculations are done in blocks of (feature, design) rows that fit in
+            # cache, so each block of the likelihood is read from memory once and no large temporary
+            # arrays are allocated. Clamping zero likelihoods to the smallest positive float before
+            # log2 gives x log x = 0 for x=0 without a (slower) masked log2.
+            nprior = self.prior.size
+            likelihood = sub_likelihood.reshape(-1, nprior)
+            weights = weighted_prior.reshape(-1)
+            tiny = np.finfo(self.dtype).tiny
+            cond = np.empty(len(likelihood), self.dtype)
+            # Blocks span whole parameter rows unless a single row does not fit, in which case
+            # the parameters are also split into blocks and their partial sums accumulated.
+            ncols = min(nprior, BLOCK_SIZE)
+            nrows = max(1, BLOCK_SIZE // ncols)
+            buffer = np.empty((min(nrows, len(likelihood)), ncols), self.dtype)
+            for row in range(0, len(likelihood), nrows):
+                rows = slice(row, row + nrows)
+                for col in range(0, nprior, ncols):
+                    cols = slice(col, col + ncols)
+                    block = likelihood[rows, cols]
+                    buf = buffer[: block.shape[0], : block.shape[1]]
+                    np.maximum(block, tiny, out=buf)
+                    np.log2(buf, out=buf)
+                    buf *= block
+                    if col == 0:
+                        np.matmul(buf, weights[cols], out=cond[rows])
+                    else:
+                        cond[rows] += buf @ weights[cols]
+            cond = cond.reshape(marginal.shape)
+            # The two entropy terms largely cancel, so combine and reduce them in float64
+            # (these arrays are much smaller than the likelihood).
+            EIG = features.sum(
+                cond.astype(np.float64) - xlog2x(marginal.astype(np.float64))).flatten()
+            IG = None
+            if tabulate or debug:
+                # Tabulate the information gain in bits IG = H0 + sum(post * log2(post)) where the
+                # posterior P(theta|y,xi) is P = P(y|theta,xi) P(theta) normalized by its sum over
+                # parameters, which is the marginal. Since log2(P) = log2(likelihood) + log2(prior),
+                # sum(post * log2(post)) = (cond + sum(likelihood * prior * log2(prior))) / marginal
+                # - log2(marginal), so the posterior never needs to be tabulated.
+                # Points where the likelihood x prior is zero have a zero information gain.
+                prior = self.prior.reshape(-1)
+                log2_prior = np.log2(prior, out=np.zeros_like(prior), where=prior > 0)
+                IG = cond + (likelihood @ (weights * log2_prior)).reshape(marginal.shape)
+                norm = marginal
+                positive = norm > 0
+                IG = np.divide(IG, norm, out=IG, where=positive)
+                IG -= np.log2(norm, out=np.zeros_like(norm), where=positive)
+                IG += self.H0
+                # All values are finite here, so zero the points with no information gain by
+                # multiplying by the mask rather than inverting it for a fancy-indexed assignment.
+                np.multiply(IG, positive, out=IG)
+                # When the marginal is so small that the likelihood values it depends on are
+                # subnormal or clamped to tiny, the decomposition above loses all precision, so
+                # use the normalized posterior for these (few) points instead. These points have
+                # a negligible weight in the EIG.
+                small = positive & (norm < tiny / np.finfo(self.dtype).eps)
+                if np.any(small):
+                    IG[small] = self._posterior_IG(likelihood[small.reshape(-1)], weights)
+            if debug:
+                # Rescale the likelihood by its maximum over parameters so that the posterior
+                # normalization does not underflow, and use IG = 0 where the marginal is zero.
+                param_axes = tuple(range(-nparams, 0))
+                lmax = likelihood64.max(axis=param_axes, keepdims=True)
+                posterior = np.divide(likelihood64, lmax, out=likelihood64, where=lmax > 0)
+                posterior *= self.prior
+                post_norm = parameters.sum(posterior, keepdims=True)
+                np.divide(posterior, post_norm, out=posterior, where=post_norm > 0)
+                IG_check = self.H0 + parameters.sum(xlog2x(posterior))
+                IG_check[marginal == 0] = 0
+                # Information gains are in bits, so their tolerance scales with the prior entropy.
+                atol = self._rtol * max(1, self.H0)
+                assert np.allclose(IG_check, IG, rtol=self._rtol, atol=atol), "IG check failed"
+                assert np.allclose(features.sum(marginal.astype(np.float64) * IG_check).flatten(),
+                                   EIG, rtol=self._rtol, atol=atol), "EIG check failed"
+        if not tabulate:
+            return None, None, EIG
+        return marginal, IG, EIG
+
+    def _posterior_IG(self, likelihood, weighted_prior):
+        """Return the information gain in bits for rows of the likelihood over the flattened
+        parameters, calculated in float64 from the normalized posterior.
+        """
+        likelihood = likelihood.astype(np.float64)
+        # Rescale each row by its maximum so that its normalization does not underflow.
+        likelihood /= likelihood.max(axis=1, keepdims=True)
+        weighted_prior = weighted_prior.astype(np.float64)
+        norm = (likelihood @ weighted_prior)[:, np.newaxis]
+        # The posterior is likelihood * prior / norm, and sums over parameters include the
+        # constraint weights, which are already part of the weighted prior.
+        posterior = likelihood * self.prior.reshape(-1) / norm
+        np.maximum(posterior, np.finfo(np.float64).tiny, out=posterior)
+        return self.H0 + np.sum(likelihood * weighted_prior / norm * np.log2(posterior), axis=1)
+
+    def likelihood_func(self, s, features=None, parameters=None):
+        features = self.features if features is None else features
+        parameters = self.parameters if parameters is None else parameters
+        likelihood = self.unnorm_lfunc(parameters, features, s, **self.lfunc_args)
+        # The parameters are the trailing axes of the likelihood, so a C-contiguous layout
+        # makes each sum over parameters a unit-stride reduction.
+        likelihood = np.ascontiguousarray(likelihood, dtype=self.dtype)
+        features.normalize(likelihood)
         return likelihood
 
     def calculateMarginalEIG(self, *nuisance_params):
         """Calculate the EIG using a posterior that is marginalized over the specified nuisance parameters."""
         if not self._initialized:
             raise RuntimeError("Must call calculateEIG before calculateMarginalEIG")
-        # Calculate the marginal prior and its entropy.
+        # Calculate the marginal prior and its entropy. The nuisance axes are kept with size 1,
+        # so sums over the marginal distributions run over all of the trailing parameter axes.
+        nparams = len(self.parameters.shape)
+        param_axes = tuple(range(-nparams, 0))
         prior = self.parameters.sum(
             self.prior, axis_names=nuisance_params, keepdims=True
         )
-        log2prior = np.log2(prior, out=np.zeros_like(prior), where=prior > 0)
-        H0 = -self.parameters.sum(prior * log2prior)
+        H0 = -np.sum(xlog2x(prior))
         # Calculate the marginal posterior and the information gain.
-        EIG = np.full(self.designs.shape, np.nan)
-        for (s, mask) in self.designs.subgrid(self.design_subgrid):
-            with GridStack(self.features, s, self.parameters):
-                sub_likelihood = self.likelihood_func(s)
-                self._buffer = np.array(sub_likelihood)
-                self._buffer *= self.prior
-                marginal = self.parameters.sum(self._buffer)
-                post_norm = self.parameters.sum(self._buffer, keepdims=True)
-                self._buffer = np.divide(
-                    self._buffer, post_norm, out=self._buffer, where=post_norm > 0
-                )
-                self._buffer = np.add(
-                    self._buffer, self.prior, out=self._buffer, where=post_norm == 0
-                )
-                post = self.parameters.sum(
-                    self._buffer, axis_names=nuisance_params, keepdims=True
-                )
+        def subgrid_EIG(s, features, parameters, sub_likelihood):
+            with GridStack(features, s, parameters):
+                if sub_likelihood is None:
+                    sub_likelihood = self.likelihood_func(s, features, parameters)
+                # likelihood_func returns an array that it has already normalized in place and
+                # that is evaluated for each subgrid, so overwrite it with the posterior.
+                posterior = sub_likelihood
+                posterior *= self.prior
+                # The posterior normalization is the marginal so only reduce once.
+                post_norm = parameters.sum(posterior, keepdims=True)
+                marginal = post_norm.reshape(post_norm.shape[:-nparams])
+                # Divide unconditionally by a clipped copy of the (small) normalization, then
+                # replace the posterior with the prior at any points where it is undefined.
+                posterior /= np.where(post_norm > 0, post_norm, 1)
+                undefined = marginal == 0
+                if np.any(undefined):
+                    posterior[undefined] = self.prior
+                post = parameters.sum(posterior, axis_names=nuisance_params, keepdims=True)
                 # Calculate the information gain for all possible designs and measurements
-                log2post = np.log2(post, out=np.zeros_like(post), where=post > 0)
-                IG = H0 + self.parameters.sum(post * log2post)
+                IG = H0 + np.sum(xlog2x(post), axis=param_axes)
                 # Tabulate the expected information gain in bits.
-                EIG[mask] = self.features.sum(marginal * IG).flatten()
-        del self._buffer
+                return features.sum(marginal * IG).flatten()
+
+        subgrids = (s for (s, mask) in self.designs.subgrid(self.design_subgrid))
+        EIG = np.full(self.designs.shape, np.nan)
+        EIG_flat = EIG.reshape(-1)
+        offset = 0
+        for EIG_sub in self._map_subgrids(subgrid_EIG, subgrids):
+            EIG_flat[offset : offset + EIG_sub.size] = EIG_sub
+            offset += EIG_sub.size
         return EIG
 
     def describe(self):
@@ -190,13 +414,13 @@ class ExperimentDesigner:
                 if self.num_subgrids > 1:
                     full_likelihood_name = "full_likelihood"
                     full_likelihood_shape = str(self.features.shape + self.designs.shape + self.parameters.shape)
-                    full_likelihood_size = np.prod(self.features.shape) * np.prod(self.designs.shape) * np.prod(self.parameters.shape) * 8 / (1 << 20)
+                    full_likelihood_size = np.prod(self.features.shape) * np.prod(self.designs.shape) * np.prod(self.parameters.shape) * self.dtype.itemsize / (1 << 20)
                     print(
                         f"ARRAY {full_likelihood_name:>16s} {full_likelihood_shape:26s} {full_likelihood_size:9.1f} Mb"
                         )
                 name = "likelihood"
                 likelihood_shape = str(self.features.shape + self.subgrid_shape + self.parameters.shape)
-                likelihood_size = np.prod(self.features.shape) * np.prod(self.subgrid_shape) * np.prod(self.parameters.shape) * 8 / (1 << 20)
+                likelihood_size = np.prod(self.features.shape) * np.prod(self.subgrid_shape) * np.prod(self.parameters.shape) * self.dtype.itemsize / (1 << 20)
                 print(
                     f"ARRAY {name:>16s} {likelihood_shape:26s} {likelihood_size:9.1f} Mb"
                     )
@@ -222,16 +446,18 @@ class ExperimentDesigner:
         cond_designs = Grid(**designs)
         cond_features = Grid(**features)
 
-        self._buffer = self.unnorm_lfunc(self.parameters, cond_features, cond_designs, **self.lfunc_args)
-        self._buffer *= self.prior
-        post_norm = self.parameters.sum(self._buffer, keepdims=True)
-        self._buffer = np.divide(
-            self._buffer, post_norm, out=self._buffer, where=post_norm > 0
+        # Only the likelihood of the requested (design, features) point is evaluated, and the
+        # posterior is not retained after it is returned.
+        posterior = self.unnorm_lfunc(self.parameters, cond_features, cond_designs, **self.lfunc_args)
+        posterior = posterior * self.prior
+        post_norm = self.parameters.sum(posterior, keepdims=True)
+        posterior = np.divide(
+            posterior, post_norm, out=posterior, where=post_norm > 0
         )
-        self._buffer = np.add(
-            self._buffer, self.prior, out=self._buffer, where=post_norm == 0
+        posterior = np.add(
+            posterior, self.prior, out=posterior, where=post_norm == 0
         )
-        return self._buffer
+        return posterior
 
 
     def update(self, **design_and_features):
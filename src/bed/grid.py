@@ -21,13 +21,24 @@ class Grid:
             # Remember the original axis definition
             self.axes_in[name] = axis
         self.names = tuple(self.axes.keys())
+        self._name_index = {name: offset for offset, name in enumerate(self.names)}
         self.shape = list([axis.size for axis in self.axes.values()])
         self.expanded_shape = tuple(self.shape)
         self.constraint = constraint
-        # Check for a constraint function
-        if constraint is not None:
+        # Check for a constraint function, or an array of precomputed constraint values
+        # on the full grid, which constrains all of the axes. The array can instead be
+        # tabulated on a grid of full_shape whose axes are passed to us, as in subgrid().
+        if isinstance(constraint, np.ndarray):
+            array_shape = tuple(self.shape) if full_shape is None else tuple(full_shape)
+            if constraint.shape != array_shape:
+                raise ValueError(
+                    f"constraint shape {constraint.shape} does not match grid shape {array_shape}"
+                )
+            constraint_names = list(self.names)
+            constraint_eval = constraint
+        elif constraint is not None:
             if not inspect.isfunction(constraint):
-                raise ValueError("constraint must be a callable function")
+                raise ValueError("constraint must be a callable function or an array")
             constraint_names = list(inspect.signature(constraint).parameters.keys())
             if "idx" in constraint_names:
                 constraint_names = list(self.names) + ["idx"]
@@ -41,39 +52,77 @@ class Grid:
             if "idx" in constraint_names:
                 self.constraint_args["idx"] = np.arange(np.prod(full_shape)).reshape(full_shape)
             constraint_eval = constraint(**self.constraint_args)
+        if constraint is not None:
             self.constraint_eval = constraint_eval
             if np.any(constraint_eval < 0):
                 raise ValueError("constraint must be non-negative")
+            # Find the nonzero constraint values with a single scan and reuse the result below.
+            nonzero = constraint_eval.nonzero()
+            nnz = len(nonzero[0]) if nonzero else 0
+            # Equivalent to np.squeeze(constraint_eval).nonzero()
+            squeezed = tuple(idx for idx, size in zip(nonzero, constraint_eval.shape) if size != 1)
             # Replace the constrained axes with the reduced set of values
-            if "idx" in constraint_names:
-                mapper = dict(zip(constraint_names, np.squeeze(constraint_eval).nonzero() * np.ones((len(self.names), 1)).astype(int)))
+            if isinstance(constraint, np.ndarray):
+                # The array has one dimension per axis, including any of length 1, so each axis
+                # is indexed along its own dimension. An axis passed from a constrained grid
+                # varies along the first constrained dimension of full_shape instead.
+                mapper = {}
+                for dim, name in enumerate(self.names):
+                    axis_in = self.axes_in[name]
+                    if axis_in.ndim == naxes and axis_in.size > 1:
+                        dim = int(np.argmax(axis_in.shape))
+                    mapper[name] = nonzero[dim]
+            elif "idx" in constraint_names:
+                mapper = dict(zip(constraint_names, squeezed * np.ones((len(self.names), 1)).astype(int)))
             else:
-                mapper = dict(zip(constraint_names, np.squeeze(constraint_eval).nonzero()))
+                mapper = dict(zip(constraint_names, squeezed))
             constraint_offsets = []
             for offset, name in enumerate(self.names):
                 if name not in constraint_names:
                     continue
                 if len(constraint_offsets) == 0:
                     shape = [1] * offset + [-1] + [1] * (naxes - offset - 1)
-                    self.shape[offset] = np.count_nonzero(constraint_eval)
+                    self.shape[offset] = nnz
                 else:
                     self.shape[offset] = 1
                 self.axes[name] = self.axes[name].ravel()[mapper[name]].reshape(shape)
                 constraint_offsets.append(offset)
             first_offset = constraint_offsets[0]
             shape = tuple([1] * first_offset + [-1] + [1] * (naxes - first_offset - 1))
-            mask = constraint_eval != 0
-            self.constraint_weights = constraint_eval[mask].ravel().reshape(shape)
+            self.constraint_weights = constraint_eval[nonzero].reshape(shape)
+            # Weights broadcast over our full (reduced) shape and flattened, for sum()
+            self._flat_weights = np.broadcast_to(self.constraint_weights, self.shape).ravel()
+            # Remember when all weights are equal so sum() can skip the weighting.
+            self._uniform_weight = None
+            if nnz > 0 and np.all(self._flat_weights == self._flat_weights[0]):
+                self._uniform_weight = self._flat_weights[0]
             # Compute and save the indices needed to expand an array tabulated on the reduced grid
             self.constraint_offsets = np.array(constraint_offsets)
-            self.constraint_indices = list(constraint_eval.nonzero())
+            self.constraint_indices = list(nonzero)
             for offset in range(naxes):
                 if offset not in constraint_offsets:
                     self.constraint_indices[offset] = slice(None)
+            # Flat index into the full grid of each point of our reduced grid, so that expand()
+            # can scatter values with a single 1D fancy-indexed assignment. The constrained axes
+            # use the nonzero indices along the first constrained axis and the others broadcast.
+            expand_index = np.broadcast_arrays(*[
+                self.constraint_indices[offset].reshape(shape)
+                if offset in constraint_offsets
+                else np.arange(size).reshape([1] * offset + [-1] + [1] * (naxes - offset - 1))
+                for offset, size in enumerate(self.shape)
+            ])
+            self._flat_expand_index = np.ravel_multi_index(expand_index, self.expanded_shape).ravel()
         self.shape = tuple(self.shape)
+        # Remember the flattened values of numeric axes that are strictly increasing so index()
+        # can use a binary search.
+        self._sorted_axes = {
+            name: axis.ravel() for name, axis in self.axes.items()
+            if axis.size > 0 and axis.dtype.kind in "iuf" and np.all(np.diff(axis.ravel()) > 0)
+        }
         # Initialize data used to implement GridStack
         self._stack_offset = 0
         self._stack_pad = 0
+        self._padded_axes = {}
 
     def __str__(self):
         return "[" + ",".join(self.names) + "]"
@@ -92,38 +141,61 @@ class Grid:
 
     def __getattr__(self, name):
         """Return a 1D array of values for the named axis."""
-        axis = self.axes[name]
-        return axis.reshape(axis.shape + tuple([1] * self._stack_pad))
-
-    def expand(self, values, missing=np.nan):
+        # Use __dict__ to avoid recursion when axes is not yet defined, e.g. during copy.
+        axes = self.__dict__.get("axes", {})
+        if name not in axes:
+            raise AttributeError(f'"{name}" is not in the grid')
+        axis = axes[name]
+        if self._stack_pad == 0:
+            return axis
+        # Cache the padded views, keyed by the padding since copies of this grid share the cache
+        # and may be stacked differently.
+        key = (name, self._stack_pad)
+        view = self._padded_axes.get(key)
+        if view is None:
+            view = self._padded_axes[key] = axis.reshape(axis.shape + (1,) * self._stack_pad)
+        return view
+
+    def expand(self, values, missing=np.nan, dtype=None, out=None):
         """Expand an array of values to the full grid shape.
         Any values removed by a constraint will be set to NaN, by default,
-        or to the specified missing value.
+        or to the specified missing value. The result has the specified dtype,
+        or else the type of values promoted as needed to hold the missing value.
+        When out is specified, the result is written into this existing array of
+        the full grid shape instead, and dtype is ignored.
         """
         if values.shape != self.shape:
             raise ValueError(
                 f"values shape {values.shape} does not match grid shape {self.shape}"
             )
+        if out is not None and out.shape != self.expanded_shape:
+            raise ValueError(
+                f"out shape {out.shape} does not match full grid shape {self.expanded_shape}"
+            )
         if self.constraint is None:
-            return values
-        expanded = np.full(self.expanded_shape, missing)
-        # This implementation is slow since it does explicit looping
-        axis0 = self.constraint_offsets[0]
-        for ii in np.ndindex(self.shape):
-            i0 = ii[axis0]
-            jj = list(ii)
-            for k in self.constraint_offsets:
-                jj[k] = self.constraint_indices[k][i0]
-            expanded[tuple(jj)] = values[ii]
-        return expanded
+            if out is not None:
+                out[...] = values
+                return out
+            return values if dtype is None else values.astype(dtype, copy=False)
+        if out is None:
+            if dtype is None:
+                dtype = np.result_type(values, missing)
+            out = np.full(self.expanded_shape, missing, dtype=dtype)
+        else:
+            out.fill(missing)
+        if out.flags.c_contiguous:
+            out.reshape(-1)[self._flat_expand_index] = values.reshape(-1)
+        else:
+            np.put(out, self._flat_expand_index, values)
+        return out
 
     def axis(self, name):
         """Return the index of the named axis.
         Used to implement our index() method.
         """
         try:
-            idx = self.names.index(name)
-        except ValueError:
+            idx = self._name_index[name]
+        except KeyError:
             raise ValueError(f'"{name}" is not in the grid')
         return idx + self._stack_offset
 
@@ -142,16 +214,34 @@ class Grid:
         if axis_names is None:
             # Use all axes by default
             axes = tuple(range(axis1, axis2))
+            if self.constraint is not None and self._uniform_weight is not None:
+                # All weights are equal (e.g. a mask) so scale a plain sum instead.
+                result = np.add.reduce(values, axis=axes, keepdims=keepdims)
+                return result if self._uniform_weight == 1 else result * self._uniform_weight
             if self.constraint is not None:
-                # Multiply by constraint weights. Avoid *= so we don't modify the input.
-                values = values * self.constraint_weights
+                # Contract the flattened grid axes with the constraint weights, which avoids
+                # a full-size weighted copy of the input and aligns the weights with our axes
+                # when other grids are stacked after us.
+                if verbose:
+                    print(f"sum: shape={values.shape} axes={axes}, keepdims={keepdims}, weighted")
+                before, after = values.shape[:axis1], values.shape[axis2:]
+                weights = self._flat_weights
+                if np.issubdtype(values.dtype, np.floating):
+                    weights = weights.astype(values.dtype, copy=False)
+                # Use explicit sizes so that a constraint with no points still reshapes.
+                result = np.matmul(
+                    weights,
+                    values.reshape((int(np.prod(before)), weights.size, int(np.prod(after)))),
+                )
+                kept = (1,) * len(self.shape) if keepdims else ()
+                return result.reshape(before + kept + after)[()]
         else:
             # Check for valid axis names
             try:
                 axes = tuple(
-                    [self.names.index(name) + self._stack_offset for name in axis_names]
+                    [self._name_index[name] + self._stack_offset for name in axis_names]
                 )
-            except ValueError:
+            except KeyError:
                 raise ValueError(f"Invalid axis_names: {axis_names}")
             if self.constraint is not None:
                 if values.shape != self.shape:
@@ -160,12 +250,28 @@ class Grid:
                     )
                 # Multiply by constraint weights. Avoid *= so we don't modify the input.
                 values = values * self.constraint_weights
+                if values.dtype.kind in "biuf":
+                    # Accumulate the weighted values directly into the kept axes of the full
+                    # grid, so the reduction only touches points that satisfy the constraint.
+                    kept = [i for i in range(len(self.shape)) if i not in axes]
+                    kept_shape = [self.expanded_shape[i] for i in kept]
+                    full_index = np.unravel_index(self._flat_expand_index, self.expanded_shape)
+                    flat_index = np.ravel_multi_index(
+                        [full_index[i] for i in kept], kept_shape
+                    ) if kept else np.zeros(values.size, dtype=np.intp)
+                    result = np.bincount(
+                        flat_index, weights=values.reshape(-1), minlength=int(np.prod(kept_shape))
+                    ).astype(np.result_type(values, 0.0), copy=False)
+                    if keepdims:
+                        kept_shape = [1 if i in axes else size for i, size in enumerate(self.expanded_shape)]
+                    return result.reshape(kept_shape)[()]
                 # Expand the weighted values
                 values = self.expand(values, missing=0.0)
 
         if verbose:
             print(f"sum: shape={values.shape} axes={axes}, keepdims={keepdims}")
-        return np.sum(values, axis=axes, keepdims=keepdims)
+        # Reduce directly rather than through the np.sum dispatch wrapper.
+        return np.add.reduce(values, axis=axes, keepdims=keepdims)
 
     def normalize(self, values):
         """Normalize the array values in place over our grid."""
@@ -177,6 +283,10 @@ class Grid:
         """Return the (min,max) extent of the named axis.
         Useful to set plot axis limits.
         """
+        values = self._sorted_axes.get(name)
+        if values is not None:
+            # Increasing axes have their extent at their endpoints.
+            return (values[0], values[-1])
         axis = self.axes[name]
         return (axis.min(), axis.max())
 
@@ -186,6 +296,16 @@ class Grid:
         Used to implement our sum() method and GridStack.at()
         """
         axis = self.axis(name)
+        values = self._sorted_axes.get(name)
+        if values is not None and np.ndim(value) == 0 and np.isfinite(value):
+            # Binary search for the neighbors of value, preferring the lower one in a tie
+            # (as argmin would).
+            idx = int(np.searchsorted(values, value))
+            if idx == len(values) or (
+                idx > 0 and abs(value - values[idx - 1]) <= abs(value - values[idx])
+            ):
+                idx -= 1
+            return (axis, idx)
         deltas = value - self.axes[name]
         idx = np.argmin(np.abs(deltas))
         return (axis, idx)
@@ -204,15 +324,20 @@ class Grid:
             for k, name in enumerate(self.names)
         }
 
-    def subgrid(self, N):
-        total_size = np.prod(self.shape)
+    def n_subgrids(self, N):
+        """Return the number of subgrids of size N that subgrid(N) yields."""
         # check that N is a positive integer
         if not isinstance(N, int) or N <= 0:
             raise ValueError("N must be an integer")
-        num_grids = np.ceil(total_size / N)
-        for i in range(int(num_grids)):
-            constraint_func = lambda idx, **kwargs: (idx >= i*N) & (idx < (i+1)*N)
-            subgrid = Grid(**self.axes, constraint = constraint_func, full_shape = self.shape)
+        return -(-int(np.prod(self.shape)) // N)
+
+    def subgrid(self, N):
+        for i in range(self.n_subgrids(N)):
+            # Build the mask of this consecutive range of flat indices directly, rather than
+            # evaluating a constraint function on a full grid of indices.
+            mask = np.zeros(self.shape, dtype=bool)
+            mask.reshape(-1)[i * N : (i + 1) * N] = True
+            subgrid = Grid(**self.axes, constraint=mask, full_shape=self.shape)
             yield subgrid, subgrid.constraint_eval
 
 
@@ -225,26 +350,29 @@ def PermutationInvariant(*args):
             raise ValueError("All axes must be identical for permutation invariance")
     size = arg0.size
     shape = np.broadcast(*args).shape
-    indices = np.arange(size)
-    M = np.stack(np.meshgrid(*[indices] * nvars, indexing="ij"), axis=-1).reshape(
-        -1, nvars
-    )
+    # Index of each variable along its own axis of a (size,) * nvars array, broadcast on use
+    # rather than stacked into a (size ** nvars, nvars) table of rows.
+    M = [
+        np.arange(size).reshape([1] * i + [-1] + [1] * (nvars - i - 1)) for i in range(nvars)
+    ]
     nfact = math.factorial(nvars)
-
-    def nperm(row):
-        nrun = 1
-        denom = 1
-        for i in range(1, nvars):
-            if row[i] < row[i - 1]:
-                return 0
-            elif row[i] == row[i - 1]:
-                nrun += 1
-            else:
-                nrun = 1
-            denom *= nrun
-        return nfact / denom
-
-    return np.array([nperm(row) for row in M]).reshape(shape)
+    # Each non-decreasing row of indices has nfact / prod(k!) distinct permutations, where k are
+    # the lengths of its runs of repeated indices. Accumulate the product of factorials one
+    # variable at a time for all rows at once, and zero the rows that are not non-decreasing.
+    # All updates are in place, and the run lengths (at most nvars) are stored in single bytes.
+    nrun = np.ones((size,) * nvars, dtype=np.int8)
+    denom = np.ones((size,) * nvars, dtype=np.int64)
+    valid = np.ones((size,) * nvars, dtype=bool)
+    for i in range(1, nvars):
+        valid &= M[i] >= M[i - 1]
+        nrun *= M[i] == M[i - 1]
+        nrun += 1
+        denom *= nrun
+    # The multinomial coefficients are exact integers so divide and mask in integer arithmetic,
+    # and only convert to floating point weights once at the end.
+    weights = nfact // denom
+    weights *= valid
+    return weights.astype(np.float64).reshape(shape)
 
 
 def TopHat(x):
@@ -252,9 +380,7 @@ def TopHat(x):
     x = np.asarray(x)
     if not np.all(np.diff(x) > 0):
         raise ValueError("x must be monotonically increasing")
-    y = np.ones_like(x)
-    y /= np.sum(y)
-    return y
+    return np.full(x.shape, 1 / x.size, dtype=np.result_type(x, 1.0))
 
 
 def CosineBump(x):
@@ -263,8 +389,13 @@ def CosineBump(x):
     if not np.all(np.diff(x) > 0):
         raise ValueError("x must be monotonically increasing")
     xlo, xhi = np.min(x), np.max(x)
-    t = 2 * np.pi * ((x - xlo) / (xhi - xlo) - 0.5)
-    y = 1 + np.cos(t)
+    # Evaluate 1 + cos(2 pi ((x - xlo) / (xhi - xlo) - 0.5)) in place in a single array.
+    y = np.subtract(x, xlo, dtype=np.result_type(x, 1.0))
+    y /= xhi - xlo
+    y -= 0.5
+    y *= 2 * np.pi
+    np.cos(y, out=y)
+    y += 1
     y /= np.sum(y)
     return y
 
@@ -273,7 +404,12 @@ def Gaussian(x, mu, sigma):
     x = np.asarray(x)
     if not np.all(np.diff(x) > 0):
         raise ValueError("x must be monotonically increasing")
-    y = np.exp(-0.5 * ((x - mu) / sigma) ** 2)
+    # Evaluate exp(-0.5 ((x - mu) / sigma) ** 2) in place in a single array.
+    y = np.subtract(x, mu, dtype=np.result_type(x, 1.0))
+    y /= sigma
+    np.square(y, out=y)
+    y *= -0.5
+    np.exp(y, out=y)
     y /= np.sum(y)
     return y
 
@@ -282,6 +418,11 @@ class GridStack:
 
     def __init__(self, *grids):
         self.grids = grids
+        # Map each axis name to the first grid that has it, for at()
+        self._owners = {}
+        for grid in grids:
+            for name in grid.names:
+                self._owners.setdefault(name, grid)
 
     def __str__(self):
         return "[" + ",".join([str(grid) for grid in self.grids]) + "]"
@@ -312,15 +453,10 @@ class GridStack:
     def at(self, **coords):
         naxes = sum([len(grid.axes) for grid in self.grids])
         idx = [slice(None)] * naxes
-        found = {name: False for name in coords}
-        for grid in self.grids:
-            for name, value in coords.items():
-                if found[name] or (name not in grid.axes):
-                    continue
-                (axis, loc) = grid.index(name, value)
-                found[name] = True
-                idx[axis] = loc
-        missing = [name for name in found if not found[name]]
+        missing = [name for name in coords if name not in self._owners]
         if missing:
             raise ValueError(f'Invalid grid name(s): {", ".join(missing)}')
+        for name, value in coords.items():
+            (axis, loc) = self._owners[name].index(name, value)
+            idx[axis] = loc
         return tuple(idx)
@@ -4,7 +4,8 @@ import matplotlib.pyplot as plt
 from .grid import Grid
 
 
-def cornerPlot(data, grid, asize=2.5, hwspace=0.25, cmap="Blues", CL=(0.683, 0.954)):
+def cornerPlot(data, grid, asize=2.5, hwspace=0.25, cmap="Blues", CL=(0.683, 0.954),
+               check_normalized=True):
     """Generate a matrix of plots for data specified on a grid.
 
     Diagonal plots show the 1D marginal distribution of the data along each axis.
@@ -28,6 +29,9 @@ def cornerPlot(data, grid, asize=2.5, hwspace=0.25, cmap="Blues", CL=(0.683, 0.9
         Name of the colormap to use for the plots.
     CL : tuple, optional
         Confidence levels to overlay on the 2D plots. Set to None to disable.
+    check_normalized : bool, optional
+        Check that the data is normalized before calculating CL contours. Set to False
+        to skip this check, which requires a full sum over the grid.
 
     Returns
     -------
@@ -43,7 +47,7 @@ def cornerPlot(data, grid, asize=2.5, hwspace=0.25, cmap="Blues", CL=(0.683, 0.9
         raise ValueError("grid must be an instance of Grid")
 
     if CL is not None:
-        if not np.allclose(grid.sum(data), 1):
+        if check_normalized and not np.allclose(grid.sum(data), 1):
             raise ValueError(
                 "Data must be normalized for CL contours. Try setting CL=None."
             )
@@ -55,6 +59,36 @@ def cornerPlot(data, grid, asize=2.5, hwspace=0.25, cmap="Blues", CL=(0.683, 0.9
     # Ignore axes with length 1.
     axes = {name: axis.ravel() for name, axis in grid.axes_in.items() if axis.size > 1}
     naxes = len(axes)
+    # Save the plot limits of each axis.
+    extents = {name: [axis[0], axis[-1]] for name, axis in axes.items()}
+
+    # Marginal distributions are calculated by summing the data starting from the smallest cached
+    # marginal that contains the axes to keep. Without a constraint, the cache is seeded with the
+    # marginals over each leading subset of the axes, so each 2D marginal only sums over a
+    # lower-dimensional array. With a constraint, marginals not yet cached are summed directly
+    # from the weighted data on the reduced grid, without expanding it to the full grid.
+    # Axes of length 1 are summed over too.
+    marginals = {}
+    if grid.constraint is None:
+        marginals[frozenset(grid.names)] = data
+        for k in range(len(grid.names) - 1, 0, -1):
+            marginals[frozenset(grid.names[:k])] = np.add.reduce(
+                marginals[frozenset(grid.names[: k + 1])], axis=k
+            )
+
+    def marginal(*names):
+        keep = frozenset(names)
+        if keep not in marginals:
+            supersets = [k for k in marginals if keep <= k]
+            if supersets:
+                best = min(supersets, key=lambda k: marginals[k].size)
+                best_names = [name for name in grid.names if name in best]
+                sum_axes = tuple(i for i, name in enumerate(best_names) if name not in keep)
+                marginals[keep] = np.add.reduce(marginals[best], axis=sum_axes)
+            else:
+                sum_names = [name for name in grid.names if name not in keep]
+                marginals[keep] = grid.sum(data, axis_names=sum_names)
+        return marginals[keep]
 
     # Initialize the figure.
     fsize = naxes * asize
@@ -64,20 +98,17 @@ def cornerPlot(data, grid, asize=2.5, hwspace=0.25, cmap="Blues", CL=(0.683, 0.9
     fc = cmap(0.5)
 
     for row, rname in enumerate(axes):
-        rextent = list(axes[rname][[0, -1]])
+        rextent = extents[rname]
         for col, cname in enumerate(axes):
             ax = figaxes[row, col]
             if col > row:
                 ax.set_visible(False)
                 continue
-            cextent = list(axes[cname][[0, -1]])
+            cextent = extents[cname]
             ax.set(xlim=cextent)
             if row != col:
                 ax.set(ylim=rextent)
-                axlist = tuple(
-                    [name for k, name in enumerate(axes) if k not in (row, col)]
-                )
-                data2d = grid.sum(data, axis_names=axlist).T
+                data2d = marginal(cname, rname).T
                 vmax = 1.5 * data2d.max()
                 ax.imshow(
                     data2d,
@@ -105,8 +136,7 @@ def cornerPlot(data, grid, asize=2.5, hwspace=0.25, cmap="Blues", CL=(0.683, 0.9
                         linestyles=("-", "--", ":")[: len(levels)][::-1],
                     )
             else:
-                axlist = tuple([name for k, name in enumerate(axes) if k != row])
-                data1d = grid.sum(data, axis_names=axlist)
+                data1d = marginal(rname)
                 ax.fill_between(axes[rname], data1d, ec="none", fc=fc)
                 ax.plot(axes[rname], data1d, c=ec)
                 ax.set(ylim=(0, None), yticks=[])
@@ -2,7 +2,7 @@ import unittest
 
 import numpy as np
 
-from bed.grid import Grid, GridStack
+from bed.grid import Grid, GridStack, PermutationInvariant
 from bed.design import ExperimentDesigner
 
 
@@ -78,6 +78,37 @@ class TestDesign(unittest.TestCase):
         self.assertAlmostEqual(designer.EIG.max(), 2.4501367058730814)
 
 
+    def test_sine_wave_subgrid_length1(self):
+        # A design axis of length 1 is carried through each subgrid
+        designs = Grid(t_obs=np.linspace(0, 5, 51), gain=[1.0])
+        features = Grid(y_obs=np.linspace(-1.25, 1.25, 100))
+        params = Grid(amplitude=1, frequency=np.linspace(0.2, 2.0, 181), offset=0)
+
+        def unnorm_lfunc(params, features, designs, **kwargs):
+            y_mean = designs.gain * params.amplitude * np.sin(
+                params.frequency * (designs.t_obs - params.offset)
+            )
+            y_diff = features.y_obs - y_mean
+            likelihood = np.exp(-0.5 * (y_diff / kwargs["sigma_y"]) ** 2)
+            return likelihood
+
+        designer = ExperimentDesigner(params, 
+            features, 
+            designs, 
+            unnorm_lfunc, 
+            lfunc_args={'sigma_y': 0.1},
+            mem=3)
+
+        prior = np.ones(params.shape)
+        params.normalize(prior)
+
+        best = designer.calculateEIG(prior)
+        self.assertEqual(designer.subgrid_shape, (10, 1))
+        self.assertEqual(best["t_obs"], 3.5)
+        self.assertEqual(best["gain"], 1.0)
+        self.assertEqual(designer.EIG.shape, (51, 1))
+        self.assertAlmostEqual(designer.EIG.max(), 2.4501367058730814)
+
     def test_sine_wave_subgrid_invalid(self):
         designs = Grid(t_obs=np.linspace(0, 5, 51))
         features = Grid(y_obs=np.linspace(-1.25, 1.25, 100))
@@ -96,4 +127,178 @@ class TestDesign(unittest.TestCase):
                 designs, 
                 unnorm_lfunc, 
                 lfunc_args={'sigma_y': 0.1},
-                mem=0)
\ No newline at end of file
+                mem=0)
+        for dtype in (np.float16, np.int32):
+            with self.assertRaises(ValueError):
+                ExperimentDesigner(params, features, designs, unnorm_lfunc,
+                    lfunc_args={'sigma_y': 0.1}, dtype=dtype)
+        for n_jobs in (0, -2, 2.0, True):
+            with self.assertRaises(ValueError):
+                ExperimentDesigner(params, features, designs, unnorm_lfunc,
+                    lfunc_args={'sigma_y': 0.1}, n_jobs=n_jobs)
+
+    def test_sine_wave_float32(self):
+        designs = Grid(t_obs=np.linspace(0, 5, 51))
+        features = Grid(y_obs=np.linspace(-1.25, 1.25, 100))
+        params = Grid(amplitude=1, frequency=np.linspace(0.2, 2.0, 181), offset=0)
+
+        def unnorm_lfunc(params, features, designs, **kwargs):
+            y_mean = params.amplitude * np.sin(
+                params.frequency * (designs.t_obs - params.offset)
+            )
+            y_diff = features.y_obs - y_mean
+            likelihood = np.exp(-0.5 * (y_diff / kwargs["sigma_y"]) ** 2)
+            return likelihood
+
+        designer = ExperimentDesigner(params, 
+            features, 
+            designs, 
+            unnorm_lfunc, 
+            lfunc_args={'sigma_y': 0.1},
+            dtype=np.float32)
+
+        prior = np.ones(params.shape)
+        params.normalize(prior)
+
+        best = designer.calculateEIG(prior, debug=True)
+        self.assertEqual(best["t_obs"], 3.5)
+        self.assertEqual(designer.marginal.dtype, np.float32)
+        self.assertEqual(designer.EIG.shape, (51,))
+
+        self.assertAlmostEqual(designer.EIG.min(), 0, places=4)
+        self.assertAlmostEqual(designer.EIG.max(), 2.4501367058730814, places=4)
+
+    def test_sine_wave_narrow(self):
+        designs = Grid(t_obs=np.linspace(0, 5, 51))
+        features = Grid(y_obs=np.linspace(-1.25, 1.25, 100))
+        params = Grid(amplitude=1, frequency=np.linspace(0.2, 2.0, 181), offset=0)
+
+        def unnorm_lfunc(params, features, designs, **kwargs):
+            y_mean = params.amplitude * np.sin(
+                params.frequency * (designs.t_obs - params.offset)
+            )
+            y_diff = features.y_obs - y_mean
+            likelihood = np.exp(-0.5 * (y_diff / kwargs["sigma_y"]) ** 2)
+            return likelihood
+
+        designer = ExperimentDesigner(params,
+            features,
+            designs,
+            unnorm_lfunc,
+            lfunc_args={'sigma_y': 0.03})
+
+        prior = np.ones(params.shape)
+        params.normalize(prior)
+        designer.calculateEIG(prior, debug=True)
+
+        # Calculate the IG from the normalized posterior, rescaling the likelihood by its
+        # maximum over parameters so that the posterior normalization does not underflow.
+        with GridStack(features, designs, params):
+            likelihood = designer.likelihood_func(designs, features, params)
+            lmax = likelihood.max(axis=(2, 3, 4), keepdims=True)
+            posterior = np.divide(likelihood, lmax, out=np.zeros_like(likelihood), where=lmax > 0)
+            posterior *= prior
+            norm = params.sum(posterior, keepdims=True)
+            np.divide(posterior, norm, out=posterior, where=norm > 0)
+            log2_posterior = np.log2(posterior, out=np.zeros_like(posterior), where=posterior > 0)
+            IG = designer.H0 + params.sum(posterior * log2_posterior)
+        # The IG is zero by convention where the marginal underflows to zero.
+        IG[designer.marginal == 0] = 0
+        self.assertTrue(np.allclose(designer.IG, IG))
+        self.assertLessEqual(designer.IG.max(), np.log2(181) + 1e-9)
+        self.assertAlmostEqual(designer.EIG.max(), np.sum(designer.marginal * designer.IG, axis=0).max())
+
+    def test_float32_constrained_parameters(self):
+        designs = Grid(t_obs=np.linspace(0, 5, 21))
+        features = Grid(y_obs=np.linspace(-2.5, 2.5, 60))
+        params = Grid(
+            a=np.linspace(0, 1, 12),
+            b=np.linspace(0, 1, 12),
+            constraint=lambda a, b: PermutationInvariant(a, b),
+        )
+
+        def unnorm_lfunc(params, features, designs, **kwargs):
+            y_mean = params.a * np.sin(designs.t_obs) + params.b * np.cos(designs.t_obs)
+            y_diff = features.y_obs - y_mean
+            likelihood = np.exp(-0.5 * (y_diff / kwargs["sigma_y"]) ** 2)
+            return likelihood
+
+        prior = np.ones(params.shape)
+        params.normalize(prior)
+        EIG = {}
+        for dtype in (np.float64, np.float32):
+            designer = ExperimentDesigner(params,
+                features,
+                designs,
+                unnorm_lfunc,
+                lfunc_args={'sigma_y': 0.2},
+                dtype=dtype)
+            designer.calculateEIG(prior)
+            self.assertEqual(designer.marginal.dtype, dtype)
+            EIG[dtype] = designer.EIG
+        self.assertTrue(np.allclose(EIG[np.float32], EIG[np.float64], atol=1e-4))
+
+    def test_sine_wave_threads(self):
+        designs = Grid(t_obs=np.linspace(0, 5, 51))
+        features = Grid(y_obs=np.linspace(-1.25, 1.25, 100))
+        params = Grid(amplitude=1, frequency=np.linspace(0.2, 2.0, 181), offset=0)
+
+        def unnorm_lfunc(params, features, designs, **kwargs):
+            y_mean = params.amplitude * np.sin(
+                params.frequency * (designs.t_obs - params.offset)
+            )
+            y_diff = features.y_obs - y_mean
+            likelihood = np.exp(-0.5 * (y_diff / kwargs["sigma_y"]) ** 2)
+            return likelihood
+
+        designer = ExperimentDesigner(params, 
+            features, 
+            designs, 
+            unnorm_lfunc, 
+            lfunc_args={'sigma_y': 0.1},
+            n_jobs=np.int64(4))
+
+        prior = np.ones(params.shape)
+        params.normalize(prior)
+
+        best = designer.calculateEIG(prior)
+        self.assertEqual(designer.subgrid_shape, (13,))
+        self.assertEqual(best["t_obs"], 3.5)
+        self.assertEqual(designer.EIG.shape, (51,))
+        self.assertFalse(np.any(np.isnan(designer.EIG)))
+
+        self.assertAlmostEqual(designer.EIG.min(), 0)
+        self.assertAlmostEqual(designer.EIG.max(), 2.4501367058730814)
+
+    def test_sine_wave_marginal(self):
+        designs = Grid(t_obs=np.linspace(0, 5, 51))
+        features = Grid(y_obs=np.linspace(-1.25, 1.25, 100))
+        params = Grid(amplitude=np.linspace(0.5, 1.5, 11), frequency=np.linspace(0.2, 2.0, 41), offset=0)
+
+        def unnorm_lfunc(params, features, designs, **kwargs):
+            y_mean = params.amplitude * np.sin(
+                params.frequency * (designs.t_obs - params.offset)
+            )
+            y_diff = features.y_obs - y_mean
+            likelihood = np.exp(-0.5 * (y_diff / kwargs["sigma_y"]) ** 2)
+            return likelihood
+
+        designer = ExperimentDesigner(params, 
+            features, 
+            designs, 
+            unnorm_lfunc, 
+            lfunc_args={'sigma_y': 0.1},
+            mem=1)
+
+        prior = np.ones(params.shape)
+        params.normalize(prior)
+
+        designer.calculateEIG(prior)
+        # Marginalizing over no parameters recovers the full EIG
+        EIG = designer.calculateMarginalEIG()
+        self.assertTrue(np.allclose(EIG, designer.EIG))
+        # Marginalizing over a nuisance parameter can only reduce the EIG
+        EIG = designer.calculateMarginalEIG("amplitude")
+        self.assertEqual(EIG.shape, (51,))
+        self.assertTrue(np.all(EIG <= designer.EIG + 1e-12))
+        self.assertLess(EIG.sum(), designer.EIG.sum())
@@ -2,7 +2,7 @@ import unittest
 
 import numpy as np
 
-from bed.grid import Grid, GridStack, PermutationInvariant, CosineBump
+from bed.grid import Grid, GridStack, PermutationInvariant, TopHat, CosineBump
 
 
 class TestGrid(unittest.TestCase):
@@ -30,10 +30,32 @@ class TestGrid(unittest.TestCase):
         )
         self.assertTrue(np.array_equal(grid.axes_in["y"], np.arange(4)))
 
+    def test_ctor_constraint_array(self):
+        x, y = np.arange(3).reshape(-1, 1), np.arange(4)
+        grid = Grid(x=np.arange(3), y=np.arange(4), constraint=x + y < 3)
+        self.assertTrue(np.array_equal(grid.x, [[0], [0], [0], [1], [1], [2]]))
+        self.assertTrue(np.array_equal(grid.y, [[0], [1], [2], [0], [1], [0]]))
+
+    def test_ctor_constraint_array_length1(self):
+        grid = Grid(x=[1, 2, 3], y=1, constraint=np.array([[True], [False], [True]]))
+        self.assertEqual(grid.shape, (2, 1))
+        self.assertTrue(np.array_equal(grid.x, [[1], [3]]))
+        self.assertTrue(np.array_equal(grid.y, [[1], [1]]))
+        self.assertTrue(np.array_equal(grid.expand(np.array([[1.0], [2.0]]), missing=0), [[1], [0], [2]]))
+
+    def test_ctor_constraint_array_invalid(self):
+        with self.assertRaises(ValueError):
+            Grid(x=[1, 2, 3], y=[1, 2], constraint=np.array([True, False, True]))
+
     def test_ctor_constraint_invalid(self):
         with self.assertRaises(ValueError):
             Grid(x=[1, 2, 3], y=[4, 5], z=[6, 7, 8], constraint=lambda a, b: a < b)
 
+    def test_ctor_non_numeric(self):
+        grid = Grid(label=["a", "b", "c"], y=[1, 2])
+        self.assertEqual(grid.shape, (3, 2))
+        self.assertEqual(grid.index("y", 1.8), (1, 1))
+
     def test_expand_2d(self):
         g1 = Grid(x=[1, 2, 3], u=[4, 5], y=1, v=[6, 7, 8, 9])
         g2 = Grid(
@@ -69,6 +91,24 @@ class TestGrid(unittest.TestCase):
         nonzero = ~np.isnan(z2e)
         assert np.array_equal(z1[nonzero], z2e[nonzero])
 
+    def test_expand_dtype(self):
+        grid = Grid(x=np.arange(3), y=np.arange(4), constraint=lambda x, y: x + y < 3)
+        self.assertEqual(grid.expand(np.ones(grid.shape, np.float32)).dtype, np.float32)
+        self.assertEqual(grid.expand(np.ones(grid.shape, int)).dtype, np.float64)
+        self.assertEqual(grid.expand(np.ones(grid.shape, int), missing=0).dtype, int)
+        self.assertEqual(grid.expand(np.ones(grid.shape), dtype=np.float32).dtype, np.float32)
+
+    def test_expand_out(self):
+        grid = Grid(x=np.arange(3), y=np.arange(4), constraint=lambda x, y: x + y < 3)
+        values = np.arange(grid.shape[0], dtype=float).reshape(grid.shape)
+        out = np.ones((3, 4))
+        self.assertIs(grid.expand(values, missing=0.0, out=out), out)
+        self.assertTrue(np.array_equal(out, grid.expand(values, missing=0.0)))
+        out = np.ones((4, 3)).T
+        self.assertTrue(np.array_equal(grid.expand(values, out=out), grid.expand(values), equal_nan=True))
+        with self.assertRaises(ValueError):
+            grid.expand(values, out=np.ones((3, 3)))
+
     def test_sum(self):
         grid = Grid(x=np.arange(3), y=np.arange(4))
         self.assertEqual(grid.sum(np.ones(grid.shape)), 12)
@@ -119,17 +159,76 @@ class TestGrid(unittest.TestCase):
         z2 = (g2.x + g2.y + g2.z) * g2.u
         self.assertEqual(g1.sum(z1), g2.sum(z2))
 
+    def test_sum_constrained_stack(self):
+        g1 = Grid(x=[1, 2, 3], y=[1, 2, 3], constraint=lambda x, y: PermutationInvariant(x, y))
+        g2 = Grid(z=[1, 2])
+        with GridStack(g1, g2):
+            values = (g1.x + g1.y) * g2.z
+            self.assertTrue(np.array_equal(g1.sum(values), g1.sum(values[..., 0]) * np.array([1, 2])))
+            self.assertEqual(g1.sum(values, keepdims=True).shape, (1, 1, 2))
+
+    def test_sum_empty_constraint(self):
+        grid = Grid(x=[1, 2, 3], y=[1, 2], constraint=lambda x, y: x + 0 * y < 0)
+        self.assertEqual(grid.shape, (0, 1))
+        self.assertEqual(grid.sum(np.ones(grid.shape)), 0)
+        self.assertEqual(grid.sum(np.ones(grid.shape), keepdims=True).shape, (1, 1))
+        g2 = Grid(z=[1, 2])
+        with GridStack(grid, g2):
+            self.assertTrue(np.array_equal(grid.sum(np.ones(grid.shape + (2,))), [0, 0]))
+
+    def test_sum_partial_constraint(self):
+        g1 = Grid(x=[1, 2, 3], u=[4, 5], y=1, v=[6, 7, 8, 9])
+        g2 = Grid(
+            x=[1, 2, 3],
+            u=[4, 5],
+            y=1,
+            v=[6, 7, 8, 9],
+            constraint=lambda u, v: ((u + v) % 2 == 1) * 0.5,
+        )
+        z1 = g1.x * ((g1.u + g1.v) % 2) * 0.5
+        z2 = g2.x * np.ones(g2.shape)
+        for names in (("x",), ("u",), ("x", "v"), ("x", "u", "y", "v")):
+            for keepdims in (False, True):
+                expected = g1.sum(z1, axis_names=names, keepdims=keepdims)
+                result = g2.sum(z2, axis_names=names, keepdims=keepdims)
+                self.assertEqual(np.shape(result), np.shape(expected))
+                self.assertTrue(np.allclose(result, expected))
+
     def test_sum_invalid(self):
         grid = Grid(x=np.arange(3), y=np.arange(4))
         with self.assertRaises(ValueError):
             grid.sum(np.ones(grid.shape), axis_names=("x", "z"))
 
+    def test_index(self):
+        grid = Grid(x=[0.0, 1.0, 2.0, 4.0], y=[3, 1, 2])
+        self.assertEqual(grid.index("x", 1.2), (0, 1))
+        self.assertEqual(grid.index("x", 3.5), (0, 3))
+        self.assertEqual(grid.index("x", -5), (0, 0))
+        self.assertEqual(grid.index("x", 10), (0, 3))
+        # A value midway between two points picks the lower index, as argmin does
+        self.assertEqual(grid.index("x", 0.5), (0, 0))
+        self.assertEqual(grid.index("x", 3.0), (0, 2))
+        # Axes that are not increasing are searched point by point
+        self.assertEqual(grid.index("y", 2.2), (1, 2))
+        self.assertEqual(grid.index("y", 1.5), (1, 1))
+        for value in np.linspace(-1, 5, 61):
+            self.assertEqual(grid.index("x", value)[1], np.argmin(np.abs(value - grid.x)))
+        with self.assertRaises(ValueError):
+            grid.index("z", 1)
+        # An empty axis has no closest point
+        grid = Grid(x=np.array([]), y=[1, 2])
+        with self.assertRaises(ValueError):
+            grid.index("x", 1.0)
+        with self.assertRaises(ValueError):
+            grid.extent("x")
+
     def test_subgrid(self):
         grid = Grid(x=np.arange(3), y=np.arange(3))
         s, mask = next(grid.subgrid(2))
         self.assertTrue(np.array_equal(s.x, [[0], [0]]))
         self.assertTrue(np.array_equal(s.y, [[0], [1]]))
         self.assertTrue(len(list(grid.subgrid(2))) == 5)
+        self.assertEqual(grid.n_subgrids(2), 5)
         self.assertTrue(np.array_equal(mask, 
         [[ True,  True, False],
         [False, False, False],
@@ -141,14 +240,31 @@ class TestGrid(unittest.TestCase):
         self.assertTrue(np.array_equal(s.x, [[0], [0], [0]]))
         self.assertTrue(np.array_equal(s.y, [[0], [1], [2]]))
         self.assertTrue(len(list(grid.subgrid(3))) == 2)
+        self.assertEqual(grid.n_subgrids(3), 2)
         self.assertTrue(np.array_equal(mask, [[True],[True],[True],[False],[False],[False]]))
 
+    def test_subgrid_length1(self):
+        grid = Grid(x=np.arange(3), u=1.0, y=np.arange(2))
+        subgrids = [s for s, mask in grid.subgrid(4)]
+        self.assertEqual([s.shape for s in subgrids], [(4, 1, 1), (2, 1, 1)])
+        self.assertTrue(np.array_equal(subgrids[0].x.ravel(), [0, 0, 1, 1]))
+        self.assertTrue(np.array_equal(subgrids[0].u.ravel(), [1, 1, 1, 1]))
+        self.assertTrue(np.array_equal(subgrids[0].y.ravel(), [0, 1, 0, 1]))
+        # Subgrids of a constrained grid with another axis cover all of its points in order
+        grid = Grid(x=np.arange(3), y=np.arange(3), z=[4, 5], constraint=lambda x, y: x + y < 3)
+        subgrids = [s for s, mask in grid.subgrid(4)]
+        for name in grid.names:
+            values = np.concatenate([np.broadcast_to(s.axes[name], s.shape).ravel() for s in subgrids])
+            self.assertTrue(np.array_equal(values, np.broadcast_to(grid.axes[name], grid.shape).ravel()))
+
     def test_subgrid_invalid(self):
         grid = Grid(x=np.arange(3), y=np.arange(3))
         with self.assertRaises(ValueError):
             next(grid.subgrid(2.1))
         with self.assertRaises(ValueError):
             next(grid.subgrid(-1))
+        with self.assertRaises(ValueError):
+            grid.n_subgrids(0)
 
 class TestPermutationInvariant(unittest.TestCase):
 
@@ -178,6 +294,18 @@ class TestPermutationInvariant(unittest.TestCase):
             PermutationInvariant(np.array([1, 2, 3]), np.array([1, 2]))
 
 
+class TestTopHat(unittest.TestCase):
+
+    def test_basic(self):
+        y = TopHat(np.linspace(-1, 1, 5))
+        self.assertTrue(np.array_equal(y, np.full(5, 0.2)))
+
+    def test_int(self):
+        y = TopHat(np.arange(4))
+        self.assertEqual(y.dtype, np.float64)
+        self.assertTrue(np.array_equal(y, np.full(4, 0.25)))
+
+
 class TestCosineBump(unittest.TestCase):
 
     def test_basic(self):
@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+
+try:
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from bed.plot import cornerPlot
+except ImportError:
+    plt = None
+
+from bed.grid import Grid, PermutationInvariant
+
+
+@unittest.skipIf(plt is None, "matplotlib is not installed")
+class TestCornerPlot(unittest.TestCase):
+
+    def tearDown(self):
+        plt.close("all")
+
+    def test_length1_axis(self):
+        grid = Grid(x=np.linspace(0, 1, 5), k=1.0, y=np.linspace(0, 2, 6))
+        data = np.random.default_rng(0).random(grid.shape)
+        grid.normalize(data)
+        figure, axes = cornerPlot(data, grid)
+        # The axis of length 1 is not plotted
+        self.assertEqual(axes.shape, (2, 2))
+        self.assertTrue(np.allclose(axes[0, 0].lines[0].get_ydata(), data.sum(axis=(1, 2))))
+        self.assertTrue(np.allclose(axes[1, 1].lines[0].get_ydata(), data.sum(axis=(0, 1))))
+        self.assertTrue(np.allclose(axes[1, 0].images[0].get_array(), data[:, 0, :].T))
+        self.assertFalse(axes[0, 1].get_visible())
+
+    def test_constrained(self):
+        grid = Grid(
+            x=np.linspace(0, 1, 5),
+            y=np.linspace(0, 1, 5),
+            z=np.linspace(0, 2, 3),
+            constraint=lambda x, y: PermutationInvariant(x, y),
+        )
+        data = np.random.default_rng(0).random(grid.shape)
+        grid.normalize(data)
+        figure, axes = cornerPlot(data, grid)
+        self.assertEqual(axes.shape, (3, 3))
+        # Marginals are sums of the weighted data expanded to the full grid
+        full = grid.expand(data * grid.constraint_weights, missing=0.0)
+        for i in range(3):
+            marginal = full.sum(axis=tuple(j for j in range(3) if j != i))
+            self.assertTrue(np.allclose(axes[i, i].lines[0].get_ydata(), marginal))
+        self.assertTrue(np.allclose(axes[2, 0].images[0].get_array(), full.sum(axis=1).T))